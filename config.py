@@ -77,8 +77,14 @@ EXCLUDE_KEYWORDS = [
 
 # ============ 存储配置 ============
 
-# 已处理帖子记录文件路径
+# 已处理ID数据库路径（SQLite，增量写入）
+PROCESSED_DB = "data/processed.sqlite"
+
+# 旧版已处理记录文件，首次打开数据库时自动迁移
 PROCESSED_POSTS_FILE = "data/processed_posts.json"
 
+# 已处理ID的 Bloom 过滤器旁路文件（快速判重，冷启动免解析JSON重建）
+PROCESSED_BLOOM_FILE = "data/processed_posts.bloom"
+
 # 最大保留的已处理帖子数量（防止文件过大）
 MAX_PROCESSED_POSTS = 5000
@@ -1 +1 @@
-# Reddit监测工具模块
+"""Reddit 监测工具的源码包，以 python -m src.main 方式运行"""
@@ -0,0 +1,120 @@
+"""
+分析结果缓存模块
+同一条内容跨运行重复出现时直接复用上次的分析结果，不再消耗 LLM 调用
+精确匹配：按 (type, id, title, content前500字) 的 sha256 作键，存 SQLite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+# orjson（C 扩展）序列化更快，未安装时退回标准库（紧凑分隔符，不缩进）
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+    _loads = json.loads
+
+CACHE_DB = "data/analysis_cache.sqlite"
+
+# 条目最长保留时间（秒）：超过 MAX_POST_AGE_DAYS 的帖子在预过滤就被
+# 丢弃，不会再查到同一内容，留着只会让库无限膨胀
+CACHE_TTL = 7 * 24 * 3600
+
+# 行数上限兜底（防止 TTL 内被异常流量灌爆），按插入顺序淘汰最旧的
+MAX_CACHE_ROWS = 5000
+
+# 模块级连接：进程内复用，WAL 模式下读写互不阻塞
+_conn = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        db_dir = os.path.dirname(CACHE_DB)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        _conn = sqlite3.connect(CACHE_DB)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis("
+            "key TEXT PRIMARY KEY, result TEXT, created_at REAL)"
+        )
+        # 每次运行初始化时清理一趟：过期条目按 TTL 删，总量超限时
+        # 按 rowid（插入顺序）淘汰最旧的，与已处理库的淘汰方式一致
+        _conn.execute(
+            "DELETE FROM analysis WHERE created_at < ?",
+            (time.time() - CACHE_TTL,)
+        )
+        _conn.execute(
+            "DELETE FROM analysis WHERE rowid NOT IN"
+            " (SELECT rowid FROM analysis ORDER BY rowid DESC LIMIT ?)",
+            (MAX_CACHE_ROWS,)
+        )
+        _conn.commit()
+    return _conn
+
+
+def _item_key(item: Dict) -> str:
+    """
+    内容指纹：类型+ID+标题+正文前500字，标题/正文参与可感知编辑
+    结果缓存在 item['_ck'] 上——同一条目查缓存和写缓存各调一次，
+    哈希只算一遍（下划线键只存在内存里，不会进任何持久化字段）
+    """
+    key = item.get('_ck')
+    if key is None:
+        raw = '\x1f'.join((
+            item.get('type', 'post'),
+            item.get('id', ''),
+            item.get('title', ''),
+            item.get('content', '')[:500],
+        ))
+        key = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        item['_ck'] = key
+    return key
+
+
+def get(item: Dict) -> Optional[Dict]:
+    """查询该内容的历史分析结果，未命中返回 None"""
+    try:
+        row = _get_conn().execute(
+            "SELECT result FROM analysis WHERE key = ?", (_item_key(item),)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    try:
+        result = _loads(row[0])
+        return result if isinstance(result, dict) else None
+    except ValueError:
+        return None
+
+
+def put(item: Dict, result: Dict):
+    """缓存分析结果（只存 is_relevant/reason/reply_draft 三个字段）"""
+    payload = _dumps({
+        'is_relevant': bool(result.get('is_relevant', False)),
+        'reason': result.get('reason', ''),
+        'reply_draft': result.get('reply_draft', ''),
+    })
+    try:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis VALUES(?, ?, ?)",
+            (_item_key(item), payload, time.time())
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"[警告] 写入分析缓存失败: {e}")
@@ -0,0 +1,146 @@
+"""
+去重模块
+用 Bloom 过滤器给"是否处理过这个ID"的判断加一层 O(k) 位探测，
+未命中即可确定没见过，命中时再查集合兜底（排除误报）
+标准库实现（blake2b 双哈希），不引入额外 C 依赖
+"""
+
+import hashlib
+import math
+import os
+import re
+from typing import Dict, List
+
+from config import PROCESSED_BLOOM_FILE, MAX_PROCESSED_POSTS
+from src.prefilter import get_item_text
+
+# 文件格式版本号，参数变化时强制重建
+_BLOOM_MAGIC = b'RMBF1\n'
+
+
+class BloomFilter:
+    """
+    定容 Bloom 过滤器
+    用 blake2b 的 128 位摘要拆成两个 64 位哈希做双重哈希，
+    k 个探测位置 = (h1 + i*h2) % m
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # 经典公式: m = -n*ln(p)/(ln2)^2, k = (m/n)*ln2
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1  # 保证奇数，避免退化
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def tofile(self, path: str):
+        """持久化到文件（头部记录参数 + 原始位图）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = f"{self.capacity} {self.error_rate} {self.num_bits} {self.num_hashes}\n"
+        with open(path, 'wb') as f:
+            f.write(_BLOOM_MAGIC)
+            f.write(header.encode('ascii'))
+            f.write(bytes(self.bits))
+
+    @classmethod
+    def fromfile(cls, path: str) -> 'BloomFilter':
+        with open(path, 'rb') as f:
+            if f.read(len(_BLOOM_MAGIC)) != _BLOOM_MAGIC:
+                raise ValueError("bloom 文件格式不匹配")
+            capacity, error_rate, num_bits, num_hashes = f.readline().split()
+            bloom = cls(int(capacity), float(error_rate))
+            if bloom.num_bits != int(num_bits) or bloom.num_hashes != int(num_hashes):
+                raise ValueError("bloom 参数不匹配")
+            bloom.bits = bytearray(f.read())
+            if len(bloom.bits) != (bloom.num_bits + 7) // 8:
+                raise ValueError("bloom 位图长度不匹配")
+        return bloom
+
+
+class ProcessedIndex:
+    """
+    已处理ID索引：Bloom 快速判重 + 集合兜底
+    Bloom 持久化为 JSON 记录的旁路文件，冷启动时直接读位图，
+    仅当文件缺失/损坏时才从ID集合重建
+    """
+
+    def __init__(self, processed_ids: set):
+        self.ids = processed_ids
+        self.bloom = self._load_or_rebuild(processed_ids)
+
+    @staticmethod
+    def _load_or_rebuild(processed_ids: set) -> BloomFilter:
+        try:
+            if os.path.exists(PROCESSED_BLOOM_FILE):
+                return BloomFilter.fromfile(PROCESSED_BLOOM_FILE)
+        except Exception as e:
+            print(f"[警告] 加载 bloom 文件失败，重建: {e}")
+        bloom = BloomFilter(capacity=max(MAX_PROCESSED_POSTS, len(processed_ids)))
+        for item_id in processed_ids:
+            bloom.add(item_id)
+        return bloom
+
+    def seen(self, item_id: str) -> bool:
+        """Bloom 未命中 => 一定没处理过；命中再查集合排除误报"""
+        return item_id in self.bloom and item_id in self.ids
+
+    def mark(self, item_id: str):
+        self.bloom.add(item_id)
+        self.ids.add(item_id)
+
+    def save_bloom(self):
+        try:
+            self.bloom.tofile(PROCESSED_BLOOM_FILE)
+        except Exception as e:
+            print(f"[错误] 保存 bloom 文件失败: {e}")
+
+
+# ============ 同批内容去重 ============
+# Reddit 的跨版块转发（crosspost）ID 不同但文本几乎一样，
+# 按归一化文本指纹去重可以直接省掉重复的 LLM 调用
+
+_WS_RE = re.compile(r'\s+')
+
+
+def content_fingerprint(item: Dict) -> int:
+    """
+    标题+正文归一化（小写、压缩空白）后的 64 位指纹
+    小写化复用预过滤缓存在 item['_lc'] 上的文本，同一条内容不再重复 lower
+    """
+    text = _WS_RE.sub(' ', get_item_text(item)).strip()
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def drop_duplicate_content(items: List[Dict]) -> List[Dict]:
+    """
+    去掉一次运行内文本重复的条目，保留先出现的
+    单次运行条目数有限，精确集合即可（无需 Bloom 的误报代价）
+    """
+    seen = set()
+    unique = []
+    for item in items:
+        fp = content_fingerprint(item)
+        if fp in seen:
+            continue
+        seen.add(fp)
+        unique.append(item)
+
+    dropped = len(items) - len(unique)
+    if dropped > 0:
+        print(f"  [去重] 丢弃 {dropped} 条内容重复的条目")
+    return unique
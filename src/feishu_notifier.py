@@ -4,16 +4,56 @@
 支持帖子、评论和搜索结果
 """
 
+import copy
+import functools
 import os
 import json
 import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from src.logging_setup import get_logger
+
+log = get_logger(__name__)
+
+# orjson（C 扩展）序列化嵌套卡片字典比标准库快数倍，未安装时退回标准库
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    _loads = json.loads
 
 # 从环境变量获取Webhook URL
 FEISHU_WEBHOOK_URL = os.environ.get('FEISHU_WEBHOOK_URL', '')
 
+# 批量发送的并发线程数（webhook 是 I/O 密集，线程足够）
+SEND_WORKERS = 4
+
+# 模块级 Session：复用 TCP+TLS 连接，避免每条通知都重新握手
+# 配合重试策略处理飞书偶发的限流/5xx
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+    ),
+))
+
 # 内容类型配置
 TYPE_CONFIG = {
     'post': {
@@ -56,113 +96,144 @@ def extract_subreddit_from_link(link: str) -> str:
     return match.group(1) if match else ''
 
 
+@functools.lru_cache(maxsize=256)
+def _quoted_site_prefix(subreddit: str) -> str:
+    """site: 限定前缀的 URL 编码结果，按子版块缓存（数量有限，复用率高）"""
+    if subreddit:
+        return quote(f'site:reddit.com/r/{subreddit} ', safe='')
+    return quote('site:reddit.com ', safe='')
+
+
+@functools.lru_cache(maxsize=4096)
 def create_google_search_url(title: str, subreddit: str = '', link: str = '') -> str:
     """
     创建通过Google搜索Reddit帖子的链接
     使用 site:reddit.com/r/{subreddit} 限定搜索范围 + 模糊匹配标题
     避免直接访问Reddit触发429限制
-    
+
+    参数都是字符串，结果缓存避免同一条内容重复URL编码
+
     Args:
         title: 帖子标题
         subreddit: 子版块名称（备用）
         link: 帖子链接（优先从这里提取真实 subreddit）
-    
+
     Returns:
         Google搜索URL
     """
     if not title:
         return "https://www.google.com/search?q=site:reddit.com"
-    
+
     # 优先从链接中提取真实的 subreddit（避免 cross-post 导致的错误）
     real_subreddit = extract_subreddit_from_link(link) or subreddit
-    
+
     # 构建搜索查询: site:reddit.com/r/{subreddit} + "标题"（精确匹配）
-    if real_subreddit:
-        search_query = f'site:reddit.com/r/{real_subreddit} "{title}"'
-    else:
-        search_query = f'site:reddit.com "{title}"'
-    
-    # URL编码查询字符串（处理空格、特殊字符、emoji等）
-    encoded_query = quote(search_query, safe='')
-    
+    # 前缀的编码按子版块缓存，每次只需编码标题部分
+    # （quote 逐字符编码，前缀和标题分开编码与整串编码结果一致）
+    encoded_query = _quoted_site_prefix(real_subreddit) + quote(f'"{title}"', safe='')
+
     return f"https://www.google.com/search?q={encoded_query}"
 
 
+def _build_card_skeleton(content_type: str) -> Dict:
+    """
+    构建指定类型的卡片骨架（动态字段留空）
+    静态结构（config、hr、按钮外壳、类型图标/颜色）只在导入时构建一次
+    """
+    config = TYPE_CONFIG[content_type]
+
+    return {
+        "msg_type": "interactive",
+        "card": {
+            "config": {
+                "wide_screen_mode": True
+            },
+            "header": {
+                "title": {
+                    "tag": "plain_text",
+                    "content": ""
+                },
+                "template": config['header_color']
+            },
+            "elements": [
+                {"tag": "div", "text": {"tag": "lark_md", "content": ""}},  # 标题
+                {"tag": "div", "text": {"tag": "lark_md", "content": ""}},  # 内容预览
+                {"tag": "hr"},
+                {"tag": "div", "text": {"tag": "lark_md", "content": ""}},  # AI判断理由
+                {"tag": "div", "text": {"tag": "lark_md", "content": ""}},  # 参考回复
+                {"tag": "hr"},
+                {"tag": "div", "fields": []},   # 作者/社区/关键词
+                {"tag": "action", "actions": []},  # 操作按钮
+            ]
+        }
+    }
+
+
+# 每种内容类型一个骨架模板，热路径上只做 deepcopy + 填充动态字符串
+_CARD_TEMPLATES = {t: _build_card_skeleton(t) for t in TYPE_CONFIG}
+
+
 def create_card_message(item: Dict) -> Dict:
     """
     创建飞书卡片消息
-    
+
     Args:
         item: 内容信息，包含type, title, content, link, subreddit, analysis等
-    
+
     Returns:
         飞书卡片消息体
     """
     analysis = item.get('analysis', {})
     reason = analysis.get('reason', '未知')
     reply_draft = analysis.get('reply_draft', '')
-    
+
     # 获取内容类型配置
     content_type = item.get('type', 'post')
-    config = TYPE_CONFIG.get(content_type, TYPE_CONFIG['post'])
-    
+    if content_type not in TYPE_CONFIG:
+        content_type = 'post'
+    config = TYPE_CONFIG[content_type]
+
+    # 每个字段只查一次字典
+    subreddit = item.get('subreddit', '')
+    title = item.get('title', '')
+    link = item.get('link', '')
+    content = item.get('content', '')
+
     # 截断内容预览
-    content_preview = item.get('content', '')[:300]
-    if len(item.get('content', '')) > 300:
+    content_preview = content[:300]
+    if len(content) > 300:
         content_preview += '...'
-    
-    # 构建卡片元素
-    elements = [
-        {
-            "tag": "div",
-            "text": {
-                "tag": "lark_md",
-                "content": f"**{config['icon']} {config['title_label']}**\n{item.get('title', '')}"
-            }
-        },
-        {
-            "tag": "div",
-            "text": {
-                "tag": "lark_md",
-                "content": f"**📄 内容预览**\n{content_preview}"
-            }
-        },
-        {"tag": "hr"},
-        {
-            "tag": "div",
-            "text": {
-                "tag": "lark_md",
-                "content": f"**🤖 AI判断理由**\n{reason}"
-            }
-        },
-        {
-            "tag": "div",
-            "text": {
-                "tag": "lark_md",
-                "content": f"**💡 参考回复**\n```\n{reply_draft}\n```"
-            }
-        },
-        {"tag": "hr"},
-    ]
-    
-    # 添加额外信息字段
-    fields = [
-        {
-            "is_short": True,
-            "text": {
-                "tag": "lark_md",
-                "content": f"**作者**: u/{item.get('author', 'unknown')}"
-            }
-        },
-        {
-            "is_short": True,
-            "text": {
-                "tag": "lark_md",
-                "content": f"**社区**: r/{item.get('subreddit', '')}"
-            }
+
+    # 从骨架复制，只填充动态部分
+    card = copy.deepcopy(_CARD_TEMPLATES[content_type])
+
+    card['card']['header']['title']['content'] = (
+        f"🎯 Reddit潜在客户 [{config['label']}] - r/{subreddit}"
+    )
+
+    elements = card['card']['elements']
+    elements[0]['text']['content'] = f"**{config['icon']} {config['title_label']}**\n{title}"
+    elements[1]['text']['content'] = f"**📄 内容预览**\n{content_preview}"
+    elements[3]['text']['content'] = f"**🤖 AI判断理由**\n{reason}"
+    elements[4]['text']['content'] = f"**💡 参考回复**\n```\n{reply_draft}\n```"
+
+    # 额外信息字段
+    fields = elements[6]['fields']
+    fields.append({
+        "is_short": True,
+        "text": {
+            "tag": "lark_md",
+            "content": f"**作者**: u/{item.get('author', 'unknown')}"
         }
-    ]
-    
+    })
+    fields.append({
+        "is_short": True,
+        "text": {
+            "tag": "lark_md",
+            "content": f"**社区**: r/{subreddit}"
+        }
+    })
+
     # 如果是搜索结果，显示搜索关键词
     if item.get('search_keyword'):
         fields.append({
@@ -172,50 +243,43 @@ def create_card_message(item: Dict) -> Dict:
                 "content": f"**关键词**: {item['search_keyword']}"
             }
         })
-    
-    elements.append({
-        "tag": "div",
-        "fields": fields
-    })
-    
+
     # 添加操作按钮 - 提供三个选项
     # 1. Google 搜索（避免 429，但新帖子可能搜不到）
     # 2. 直接访问（备用，可能遇到 429）
     # 3. 浏览子版块（新帖子找不到时，去 new 排序页面找）
     google_search_url = create_google_search_url(
-        title=item.get('title', ''),
-        subreddit=item.get('subreddit', ''),
-        link=item.get('link', '')
+        title=title,
+        subreddit=subreddit,
+        link=link
     )
-    direct_url = item.get('link', '')
-    
+    direct_url = link
+
     # 从 link 中提取真实 subreddit 用于构建子版块链接
-    real_subreddit = extract_subreddit_from_link(item.get('link', '')) or item.get('subreddit', '')
-    subreddit_new_url = f"https://www.reddit.com/r/{real_subreddit}/new/" if real_subreddit else ""
-    
-    actions = [
-        {
-            "tag": "button",
-            "text": {
-                "tag": "plain_text",
-                "content": "🔍 Google 搜索"
-            },
-            "type": "primary",
-            "url": google_search_url
+    real_subreddit = extract_subreddit_from_link(link) or subreddit
+
+    actions = elements[7]['actions']
+    actions.append({
+        "tag": "button",
+        "text": {
+            "tag": "plain_text",
+            "content": "🔍 Google 搜索"
         },
-        {
-            "tag": "button",
-            "text": {
-                "tag": "plain_text",
-                "content": "🔗 直接访问"
-            },
-            "type": "default",
-            "url": direct_url
-        }
-    ]
-    
+        "type": "primary",
+        "url": google_search_url
+    })
+    actions.append({
+        "tag": "button",
+        "text": {
+            "tag": "plain_text",
+            "content": "🔗 直接访问"
+        },
+        "type": "default",
+        "url": direct_url
+    })
+
     # 如果有子版块信息，添加浏览子版块按钮
-    if subreddit_new_url:
+    if real_subreddit:
         actions.append({
             "tag": "button",
             "text": {
@@ -223,65 +287,125 @@ def create_card_message(item: Dict) -> Dict:
                 "content": f"📂 r/{real_subreddit}/new"
             },
             "type": "default",
-            "url": subreddit_new_url
+            "url": f"https://www.reddit.com/r/{real_subreddit}/new/"
         })
-    
-    elements.append({
-        "tag": "action",
-        "actions": actions
-    })
-    
-    # 构建完整卡片
-    card = {
-        "msg_type": "interactive",
-        "card": {
-            "config": {
-                "wide_screen_mode": True
-            },
-            "header": {
-                "title": {
-                    "tag": "plain_text",
-                    "content": f"🎯 Reddit潜在客户 [{config['label']}] - r/{item.get('subreddit', '')}"
-                },
-                "template": config['header_color']
-            },
-            "elements": elements
-        }
-    }
-    
+
     return card
 
 
+# 卡片的固定结构预序列化成字节模板，发送时只填充动态串
+# 跳过整棵嵌套 dict 的构建和序列化；%(x)b 槽位由已转义的 JSON 片段填充
+_CARD_BYTES_TEMPLATE = (
+    b'{"msg_type":"interactive","card":{'
+    b'"config":{"wide_screen_mode":true},'
+    b'"header":{"title":{"tag":"plain_text","content":%(header)b},"template":%(color)b},'
+    b'"elements":['
+    b'{"tag":"div","text":{"tag":"lark_md","content":%(title)b}},'
+    b'{"tag":"div","text":{"tag":"lark_md","content":%(preview)b}},'
+    b'{"tag":"hr"},'
+    b'{"tag":"div","text":{"tag":"lark_md","content":%(reason)b}},'
+    b'{"tag":"div","text":{"tag":"lark_md","content":%(reply)b}},'
+    b'{"tag":"hr"},'
+    b'{"tag":"div","fields":%(fields)b},'
+    b'{"tag":"action","actions":%(actions)b}'
+    b']}}'
+)
+
+# header 颜色是受控常量，转义结果预计算
+_COLOR_BYTES = {t: _dumps(cfg['header_color']) for t, cfg in TYPE_CONFIG.items()}
+
+
+def render_card_bytes(item: Dict) -> bytes:
+    """
+    直接渲染飞书卡片的 JSON 字节（与 create_card_message 结构一致）
+    动态字符串逐个经 JSON 转义后填入模板，不构建完整 dict
+    """
+    # 每个字段只查一次字典，后续全部走局部变量
+    analysis = item.get('analysis', {})
+    content_type = item.get('type', 'post')
+    if content_type not in TYPE_CONFIG:
+        content_type = 'post'
+    config = TYPE_CONFIG[content_type]
+    subreddit = item.get('subreddit', '')
+    title = item.get('title', '')
+    link = item.get('link', '')
+    author = item.get('author', 'unknown')
+    search_keyword = item.get('search_keyword', '')
+
+    content = item.get('content', '')
+    content_preview = content[:300] + ('...' if len(content) > 300 else '')
+
+    # 小的可变列表（字段/按钮）仍用 JSON 序列化，但只占整卡的一小部分
+    fields = [
+        {"is_short": True,
+         "text": {"tag": "lark_md", "content": f"**作者**: u/{author}"}},
+        {"is_short": True,
+         "text": {"tag": "lark_md", "content": f"**社区**: r/{subreddit}"}},
+    ]
+    if search_keyword:
+        fields.append({
+            "is_short": True,
+            "text": {"tag": "lark_md", "content": f"**关键词**: {search_keyword}"}
+        })
+
+    google_search_url = create_google_search_url(
+        title=title,
+        subreddit=subreddit,
+        link=link
+    )
+    real_subreddit = extract_subreddit_from_link(link) or subreddit
+    actions = [
+        {"tag": "button", "text": {"tag": "plain_text", "content": "🔍 Google 搜索"},
+         "type": "primary", "url": google_search_url},
+        {"tag": "button", "text": {"tag": "plain_text", "content": "🔗 直接访问"},
+         "type": "default", "url": link},
+    ]
+    if real_subreddit:
+        actions.append({
+            "tag": "button", "text": {"tag": "plain_text", "content": f"📂 r/{real_subreddit}/new"},
+            "type": "default", "url": f"https://www.reddit.com/r/{real_subreddit}/new/"
+        })
+
+    return _CARD_BYTES_TEMPLATE % {
+        b'header': _dumps(f"🎯 Reddit潜在客户 [{config['label']}] - r/{subreddit}"),
+        b'color': _COLOR_BYTES[content_type],
+        b'title': _dumps(f"**{config['icon']} {config['title_label']}**\n{title}"),
+        b'preview': _dumps(f"**📄 内容预览**\n{content_preview}"),
+        b'reason': _dumps(f"**🤖 AI判断理由**\n{analysis.get('reason', '未知')}"),
+        b'reply': _dumps(f"**💡 参考回复**\n```\n{analysis.get('reply_draft', '')}\n```"),
+        b'fields': _dumps(fields),
+        b'actions': _dumps(actions),
+    }
+
+
 def send_to_feishu(item: Dict) -> bool:
     """
     发送单个内容通知到飞书
     """
     if not FEISHU_WEBHOOK_URL:
-        print("[错误] FEISHU_WEBHOOK_URL 环境变量未设置")
+        log.info("[错误] FEISHU_WEBHOOK_URL 环境变量未设置")
         return False
     
     try:
-        card_message = create_card_message(item)
-        
-        response = requests.post(
+        response = _SESSION.post(
             FEISHU_WEBHOOK_URL,
             headers={'Content-Type': 'application/json'},
-            data=json.dumps(card_message),
+            data=render_card_bytes(item),
             timeout=10
         )
-        
-        result = response.json()
+
+        result = _loads(response.content)
         
         if result.get('code') == 0 or result.get('StatusCode') == 0:
             type_icon = TYPE_CONFIG.get(item.get('type', 'post'), {}).get('icon', '📄')
-            print(f"  {type_icon} 已发送: {item.get('title', '')[:40]}...")
+            log.info(f"  {type_icon} 已发送: {item.get('title', '')[:40]}...")
             return True
         else:
-            print(f"  [失败] 飞书返回: {result}")
+            log.info(f"  [失败] 飞书返回: {result}")
             return False
             
     except Exception as e:
-        print(f"  [错误] 发送失败: {e}")
+        log.info(f"  [错误] 发送失败: {e}")
         return False
 
 
@@ -292,16 +416,16 @@ def send_batch_to_feishu(items: List[Dict]) -> int:
     if not items:
         return 0
     
-    print(f"\n发送 {len(items)} 条通知到飞书...")
-    print("-" * 40)
-    
-    success_count = 0
-    for item in items:
-        if send_to_feishu(item):
-            success_count += 1
-    
-    print("-" * 40)
-    print(f"[完成] {success_count}/{len(items)} 条发送成功")
+    log.info(f"\n发送 {len(items)} 条通知到飞书...")
+    log.info("-" * 40)
+
+    # 并发发送：每条都是独立的 webhook POST，线程池隐藏网络往返
+    with ThreadPoolExecutor(max_workers=SEND_WORKERS) as executor:
+        results = list(executor.map(send_to_feishu, items))
+    success_count = sum(1 for ok in results if ok)
+
+    log.info("-" * 40)
+    log.info(f"[完成] {success_count}/{len(items)} 条发送成功")
     return success_count
 
 
@@ -359,17 +483,17 @@ def send_summary_to_feishu(stats: Dict) -> bool:
             }
         }
         
-        response = requests.post(
+        response = _SESSION.post(
             FEISHU_WEBHOOK_URL,
             headers={'Content-Type': 'application/json'},
-            data=json.dumps(message),
+            data=_dumps(message),
             timeout=10
         )
-        
-        return response.json().get('code', -1) == 0
+
+        return _loads(response.content).get('code', -1) == 0
         
     except Exception as e:
-        print(f"[错误] 发送汇总失败: {e}")
+        log.info(f"[错误] 发送汇总失败: {e}")
         return False
 
 
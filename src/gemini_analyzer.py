@@ -4,15 +4,30 @@ AI 分析模块
 支持 Gemini 和 DeepSeek 双模型，自动故障转移
 """
 
+import asyncio
+import hashlib
 import os
 import json
 import re
 import time
 from typing import Dict, List, Optional
 
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import PRODUCT_NAME, PRODUCT_DESCRIPTION
+from src.dedup import drop_duplicate_content
+from src.logging_setup import get_logger
+from src import analysis_cache
+
+log = get_logger(__name__)
+
+# orjson（C 扩展）解析 LLM 返回的 JSON 更快，未安装时退回标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 增量提取用的解码器（raw_decode 支持从任意偏移解析单个对象）
+_JSON_DECODER = json.JSONDecoder()
 
 
 # ============ API Keys ============
@@ -27,6 +42,34 @@ DEEPSEEK_MODEL = "deepseek-chat"
 BATCH_SIZE = 20
 REQUEST_DELAY = 15.0
 MAX_RETRIES = 1  # Gemini 重试次数，失败后切换到 DeepSeek
+MAX_CONCURRENT_BATCHES = 3  # 并发在途的 LLM 请求上限（受 RPM 配额约束）
+GEMINI_HEAD_START = 2.0  # 秒；竞速时先让 Gemini 跑，避免每批都白付 DeepSeek 的钱
+
+# 每批次内容部分的 token 预算（不含固定 prompt），按条目数均分
+PROMPT_TOKEN_BUDGET = 6000
+# 单条内容的 token 下限，批次很大时也保证基本上下文
+MIN_ITEM_TOKEN_BUDGET = 120
+
+# ============ 按配额调优（环境变量，可选） ============
+# GEMINI_RPM：每分钟请求配额。配置后回退间隔取 60/RPM 秒，限流器的
+# 时隙预约保证该间隔对所有并发批次的"总发送速率"生效（并发只决定
+# 同时在途多少请求，不会放大每分钟的发送量），所以聚合速率 ≤ RPM；
+# 未配置时沿用保守默认（并发3、间隔15秒）
+GEMINI_RPM = int(os.environ.get('GEMINI_RPM', '0') or 0)
+if GEMINI_RPM > 0:
+    # 在途并发上限：够把长尾请求流水线化即可，封顶8避免连接堆积
+    MAX_CONCURRENT_BATCHES = max(1, min(GEMINI_RPM, 8))
+    REQUEST_DELAY = 60.0 / GEMINI_RPM
+
+# GEMINI_MAX_INPUT_TOKENS：单请求输入 token 上限。配置后按内容
+# 实际大小贪心装批（见 pack_batches），未配置时按固定条数分批
+GEMINI_MAX_INPUT_TOKENS = int(os.environ.get('GEMINI_MAX_INPUT_TOKENS', '0') or 0)
+
+# ============ LLM 响应磁盘缓存 ============
+# 定时任务前后两次运行可能重扫同一批内容，按 prompt 哈希缓存原始响应
+# 命中时完全跳过网络调用
+LLM_CACHE_DIR = "data/llm_cache"
+LLM_CACHE_TTL = 24 * 3600  # 秒
 
 # ============ 当前使用的模型 ============
 current_provider = "gemini"  # gemini 或 deepseek
@@ -87,75 +130,369 @@ CONTENT ITEMS TO ANALYZE:
 """
 
 
+def iter_response_objects(text: str):
+    """
+    从响应文本中逐个提取 JSON 对象（增量解析）
+    数组被 max_output_tokens 截断时，截断点之前的完整对象仍然能产出
+    """
+    pos = text.find('[')
+    if pos < 0:
+        return
+    pos += 1
+    n = len(text)
+    while pos < n:
+        # 跳过分隔符，找到下一个对象的开头
+        while pos < n and text[pos] not in '{]':
+            pos += 1
+        if pos >= n or text[pos] == ']':
+            return
+        try:
+            obj, pos = _JSON_DECODER.raw_decode(text, pos)
+        except ValueError:
+            # 到达截断点，之前产出的完整对象已经拿到
+            return
+        yield obj
+
+
 def parse_batch_response(text: str) -> List[Dict]:
     """解析批量分析的JSON数组响应"""
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```\s*', '', text)
+    # 去 markdown 围栏：前后缀剥离即可，不做全文正则替换
     text = text.strip()
-    
+    if text.startswith('```'):
+        text = text.removeprefix('```json').removeprefix('```')
+        text = text.removesuffix('```').strip()
+
     try:
-        result = json.loads(text)
+        result = _json_loads(text)
         if isinstance(result, list):
             return result
-    except json.JSONDecodeError:
+    except ValueError:
         pass
-    
-    match = re.search(r'\[[\s\S]*\]', text)
-    if match:
+
+    # 首尾定界（find/rfind 是 C 级扫描），覆盖数组前后混入闲话的情况
+    # 也顺带替代了原来的贪婪正则 \[[\s\S]*\]
+    i, j = text.find('['), text.rfind(']')
+    if 0 <= i < j:
         try:
-            result = json.loads(match.group())
+            result = _json_loads(text[i:j + 1])
             if isinstance(result, list):
                 return result
-        except json.JSONDecodeError:
+        except ValueError:
             pass
-    
-    return []
 
+    # 整体解析失败（常见原因是输出被截断），增量抢救逐条完整的结果
+    salvaged = [obj for obj in iter_response_objects(text) if isinstance(obj, dict)]
+    if salvaged:
+        log.info(f"  [解析] 响应不完整，抢救出 {len(salvaged)} 条结果")
+    return salvaged
+
+
+# token 估算：CJK 大致一字一 token，其余文本约 4 字符一 token
+_CJK_RE = re.compile('[\\u3000-\\u9fff\\uf900-\\ufaff]')
 
-def format_item_for_prompt(index: int, item: Dict) -> str:
-    """格式化单个内容项用于prompt"""
-    content = item.get('content', '')[:500]
-    title = item.get('title', '')[:200]
-    
-    text = f"""
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数（无需真实 tokenizer）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """按 token 预算截断文本（二分查找最长前缀）"""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+# 条目模板只在模块级解析一次，热路径上 format_map 直接填槽
+_ITEM_TEMPLATE = """
 [Item {index}]
-Type: {item.get('type', 'post')}
-Subreddit: r/{item.get('subreddit', '')}
+Type: {type}
+Subreddit: r/{subreddit}
 Title: {title}
 Content: {content}
 """
-    if item.get('search_keyword'):
-        text += f"Search Keyword: {item['search_keyword']}\n"
-    
+
+
+def format_item_for_prompt(index: int, item: Dict,
+                           title_budget: int = 60,
+                           content_budget: int = 150) -> str:
+    """格式化单个内容项用于prompt（按 token 预算截断，避免CJK内容超预算）"""
+    text = _ITEM_TEMPLATE.format_map({
+        'index': index,
+        'type': item.get('type', 'post'),
+        'subreddit': item.get('subreddit', ''),
+        'title': truncate_to_tokens(item.get('title', ''), title_budget),
+        'content': truncate_to_tokens(item.get('content', ''), content_budget),
+    })
+    keyword = item.get('search_keyword')
+    if keyword:
+        return f"{text}Search Keyword: {keyword}\n"
     return text
 
 
-def call_gemini(prompt: str) -> Optional[str]:
-    """调用 Gemini API"""
-    from google import genai
-    
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    response = client.models.generate_content(
+def pack_batches(items: List[Dict], batch_size: int = BATCH_SIZE) -> List[List[Dict]]:
+    """
+    条目分批
+    配置了 GEMINI_MAX_INPUT_TOKENS 时按 token 预算贪心装批，把每个
+    请求窗口尽量填满（大条目少装、小条目多装）；否则按固定条数切块
+    """
+    if not items:
+        return []
+
+    if GEMINI_MAX_INPUT_TOKENS <= 0:
+        return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    budget = max(MIN_ITEM_TOKEN_BUDGET,
+                 GEMINI_MAX_INPUT_TOKENS - estimate_tokens(BATCH_ANALYSIS_PROMPT))
+
+    batches = []
+    current, current_tokens = [], 0
+    for item in items:
+        # 条目开销按原始标题+正文估算，外加格式化骨架的固定余量
+        cost = (estimate_tokens(item.get('title', ''))
+                + estimate_tokens(item.get('content', '')) + 20)
+        if current and current_tokens + cost > budget:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_reset_seconds(value: str) -> float:
+    """解析 OpenAI 风格的 x-ratelimit-reset 值（如 '6m0s' / '1.2s' / '120ms'）"""
+    value = value.strip()
+    m = re.fullmatch(r'(?:(\d+)m)?([\d.]+)s', value)
+    if m:
+        return int(m.group(1) or 0) * 60 + float(m.group(2))
+    if value.endswith('ms'):
+        try:
+            return float(value[:-2]) / 1000
+        except ValueError:
+            return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+class RateLimiter:
+    """
+    基于响应头的速率限制器
+    有 x-ratelimit-* 头时只在余量低于安全线时等待到重置点；
+    没有头信息（如 Gemini SDK）时退回固定最小间隔——间隔通过
+    时隙预约强制执行，并发在途也不会突破每间隔一次的总速率
+    """
+
+    def __init__(self, fallback_delay: float = REQUEST_DELAY, safety_margin: int = 2):
+        self.remaining = None   # None = 尚未见过限流头
+        self.reset_at = 0.0
+        self.fallback_delay = fallback_delay
+        self.safety_margin = safety_margin
+        self._next_allowed = 0.0  # 下一个可用发送时隙
+
+    def update_from_headers(self, headers):
+        """从 API 响应头更新剩余配额/重置时间"""
+        try:
+            remaining = headers.get('x-ratelimit-remaining-requests') \
+                or headers.get('x-ratelimit-remaining')
+            if remaining is not None:
+                self.remaining = int(remaining)
+            reset = headers.get('x-ratelimit-reset-requests') \
+                or headers.get('x-ratelimit-reset')
+            if reset is not None:
+                self.reset_at = time.time() + _parse_reset_seconds(str(reset))
+        except (TypeError, ValueError):
+            pass
+
+    async def wait_async(self):
+        while True:
+            now = time.time()
+
+            if self.remaining is None:
+                # 无配额信息：固定间隔。先原子占下时隙再睡眠（读改写
+                # 之间没有 await 点），并发等待者各拿各的时隙，不会
+                # 算出同一段延迟后同时醒来齐射
+                slot = max(now, self._next_allowed)
+                self._next_allowed = slot + self.fallback_delay
+                if slot > now:
+                    log.info(f"  [限流] 等待 {slot - now:.1f} 秒...")
+                    await asyncio.sleep(slot - now)
+                return
+
+            if self.remaining > self.safety_margin:
+                # 余量充足：预扣一个名额直接放行
+                self.remaining -= 1
+                return
+
+            # 接近配额：睡到重置点。醒来后配额信息已过期，清掉并
+            # 重新循环——下一轮落到间隔模式串行放行，等新响应头再更新
+            delay = max(0.0, self.reset_at - now)
+            if delay > 0:
+                log.info(f"  [限流] 等待 {delay:.1f} 秒...")
+                await asyncio.sleep(delay)
+            self.remaining = None
+
+
+# 每个服务商一把限流器：DeepSeek 的响应头只更新自己的配额视图，
+# Gemini（SDK 不暴露限流头）始终走固定间隔的时隙预约；
+# 共用一把会让 DeepSeek 报告的充裕余量把 Gemini 的间隔也清零
+gemini_limiter = RateLimiter()
+deepseek_limiter = RateLimiter()
+
+
+def _cache_path(prompt: str) -> str:
+    key = hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(LLM_CACHE_DIR, key + '.txt')
+
+
+def _cache_get(prompt: str) -> Optional[str]:
+    """读取未过期的缓存响应，没有则返回 None"""
+    path = _cache_path(prompt)
+    try:
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < LLM_CACHE_TTL:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+    except Exception:
+        pass
+    return None
+
+
+def _cache_put(prompt: str, response_text: str):
+    """缓存原始响应文本（解析逻辑仍以 parse_batch_response 为准）"""
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        with open(_cache_path(prompt), 'w', encoding='utf-8') as f:
+            f.write(response_text)
+    except Exception as e:
+        log.info(f"[警告] 写入 LLM 缓存失败: {e}")
+
+
+# ============ SDK 客户端复用 ============
+# 客户端跨批次复用，TLS 连接池与鉴权状态只建一次
+# 底层 HTTP 客户端绑定创建时的事件循环，换循环（如旧版同步包装
+# 每次 asyncio.run）时自动重建
+_gemini_client = None
+_gemini_client_loop = None
+_deepseek_client = None
+_deepseek_client_loop = None
+
+
+def _get_gemini_client():
+    global _gemini_client, _gemini_client_loop
+    loop = asyncio.get_running_loop()
+    if _gemini_client is None or _gemini_client_loop is not loop:
+        from google import genai
+        _gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+        _gemini_client_loop = loop
+    return _gemini_client
+
+
+def _get_deepseek_client():
+    global _deepseek_client, _deepseek_client_loop
+    loop = asyncio.get_running_loop()
+    if _deepseek_client is None or _deepseek_client_loop is not loop:
+        import openai
+        _deepseek_client = openai.AsyncOpenAI(
+            api_key=DEEPSEEK_API_KEY,
+            base_url="https://api.deepseek.com"
+        )
+        _deepseek_client_loop = loop
+    return _deepseek_client
+
+
+# ============ Gemini 上下文缓存 ============
+# 固定 prompt 前缀注册为服务端 CachedContent：KV 前缀在服务端已物化，
+# 每批只发送变化的条目部分，省输入 token 也降低首 token 延迟
+GEMINI_CACHE_TTL = "3600s"
+_gemini_cache_name = None          # 服务端缓存句柄（跨批次复用）
+_gemini_cache_unavailable = False  # 创建失败（如前缀低于模型最小缓存 token 数）后不再尝试
+_gemini_cache_lock = asyncio.Lock()
+
+
+async def _get_gemini_cache(client):
+    """懒创建固定前缀的服务端缓存，不可用时返回 None"""
+    global _gemini_cache_name, _gemini_cache_unavailable
+    if _gemini_cache_unavailable or _gemini_cache_name is not None:
+        return _gemini_cache_name
+    async with _gemini_cache_lock:
+        if _gemini_cache_name is None and not _gemini_cache_unavailable:
+            try:
+                cache = await client.aio.caches.create(
+                    model=GEMINI_MODEL,
+                    config={
+                        "contents": [BATCH_ANALYSIS_PROMPT],
+                        "ttl": GEMINI_CACHE_TTL,
+                    }
+                )
+                _gemini_cache_name = cache.name
+                log.info(f"  [缓存] 已注册 Gemini 上下文缓存")
+            except Exception as e:
+                # 常见原因：前缀不满足模型的最小缓存 token 数，退回全量 prompt
+                _gemini_cache_unavailable = True
+                log.info(f"  [缓存] Gemini 上下文缓存不可用，退回全量 prompt: {str(e)[:80]}")
+    return _gemini_cache_name
+
+
+async def call_gemini_async(prompt: str, items_text: Optional[str] = None) -> Optional[str]:
+    """
+    调用 Gemini API（异步）
+    items_text 给定时优先引用服务端上下文缓存，只发送条目部分
+    """
+    global _gemini_cache_name
+
+    # 发送前预约时隙：并发批次也保持每 fallback_delay 一次的总速率
+    await gemini_limiter.wait_async()
+
+    client = _get_gemini_client()
+    config = {
+        "temperature": 0.3,
+        "max_output_tokens": 2000,
+    }
+
+    if items_text is not None:
+        cache_name = await _get_gemini_cache(client)
+        if cache_name is not None:
+            try:
+                response = await client.aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=items_text,
+                    config=dict(config, cached_content=cache_name),
+                )
+                return response.text
+            except Exception as e:
+                # 缓存过期/被服务端回收：重置句柄让下一批重建，本次退回全量 prompt
+                _gemini_cache_name = None
+                log.info(f"  [缓存] 上下文缓存失效，退回全量 prompt: {str(e)[:80]}")
+
+    response = await client.aio.models.generate_content(
         model=GEMINI_MODEL,
         contents=prompt,
-        config={
-            "temperature": 0.3,
-            "max_output_tokens": 2000,
-        }
+        config=config,
     )
     return response.text
 
 
-def call_deepseek(prompt: str) -> Optional[str]:
-    """调用 DeepSeek API (OpenAI 兼容)"""
-    import openai
-    
-    client = openai.OpenAI(
-        api_key=DEEPSEEK_API_KEY,
-        base_url="https://api.deepseek.com"
-    )
-    
-    response = client.chat.completions.create(
+async def call_deepseek_async(prompt: str) -> Optional[str]:
+    """调用 DeepSeek API (OpenAI 兼容，异步)，顺带采集限流头"""
+    await deepseek_limiter.wait_async()
+
+    client = _get_deepseek_client()
+
+    # with_raw_response 暴露 HTTP 头，用于更新本服务商的限流器
+    raw = await client.chat.completions.with_raw_response.create(
         model=DEEPSEEK_MODEL,
         messages=[
             {"role": "system", "content": "You are a helpful assistant that analyzes Reddit content and outputs JSON."},
@@ -164,116 +501,231 @@ def call_deepseek(prompt: str) -> Optional[str]:
         temperature=0.3,
         max_tokens=2000
     )
-    
+    deepseek_limiter.update_from_headers(raw.headers)
+    response = raw.parse()
+
     return response.choices[0].message.content
 
 
-def analyze_batch(items: List[Dict], batch_num: int, retry_count: int = 0) -> List[Dict]:
+def _is_quota_error(error_msg: str) -> bool:
+    return "429" in error_msg or "quota" in error_msg.lower()
+
+
+async def _race_providers(prompt: str, items_text: Optional[str] = None) -> tuple:
     """
-    批量分析一组内容，支持 Gemini/DeepSeek 故障转移
+    Gemini 与 DeepSeek 竞速，先返回有效响应的胜出，慢的一方被取消
+    DeepSeek 延迟 GEMINI_HEAD_START 秒起跑：Gemini 正常时不产生额外调用，
+    Gemini 卡住或配额失败时 DeepSeek 已经在路上，省掉整个串行故障转移的等待
+
+    Returns:
+        (provider, response_text)
+    """
+    global gemini_exhausted
+
+    gemini_task = asyncio.create_task(call_gemini_async(prompt, items_text))
+
+    async def _deepseek_with_head_start():
+        await asyncio.sleep(GEMINI_HEAD_START)
+        return await call_deepseek_async(prompt)
+
+    deepseek_task = asyncio.create_task(_deepseek_with_head_start())
+
+    pending = {gemini_task, deepseek_task}
+    last_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    text = task.result()
+                except Exception as e:
+                    # 一方失败不致命，继续等另一方
+                    last_error = e
+                    if task is gemini_task and _is_quota_error(str(e)):
+                        gemini_exhausted = True
+                    continue
+                if text:
+                    return ('gemini' if task is gemini_task else 'deepseek'), text
+    finally:
+        for task in pending:
+            task.cancel()
+
+    # 两边都失败，抛出最后一个错误交给上层处理
+    raise last_error if last_error else RuntimeError("所有模型都未返回内容")
+
+
+async def analyze_batch_async(items: List[Dict], batch_num: int,
+                              semaphore: Optional[asyncio.Semaphore] = None,
+                              retry_count: int = 0) -> List[Dict]:
+    """
+    批量分析一组内容（异步），支持 Gemini/DeepSeek 故障转移
+    semaphore 限制并发在途请求数，避免触发 RPM 配额
     """
     global gemini_exhausted, current_provider
-    
+
     if not items:
         return []
-    
-    # 构建 prompt
-    prompt = BATCH_ANALYSIS_PROMPT
-    for i, item in enumerate(items):
-        prompt += format_item_for_prompt(i, item)
-    
+
+    # 按条目数均分 token 预算，标题约占1/4
+    per_item = max(MIN_ITEM_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET // len(items))
+    title_budget = min(80, per_item // 4)
+    content_budget = per_item - title_budget
+
+    # 构建 prompt（列表收集 + 一次 join，避免逐段拼接的二次复制）
+    # 条目部分单独保留：Gemini 走上下文缓存时只需发送这一段
+    items_text = ''.join(
+        format_item_for_prompt(i, item, title_budget, content_budget)
+        for i, item in enumerate(items)
+    )
+    prompt = BATCH_ANALYSIS_PROMPT + items_text
+
+    # 磁盘缓存命中则完全跳过网络调用
+    cached = _cache_get(prompt)
+    if cached is not None:
+        results = parse_batch_response(cached)
+        if results:
+            log.info(f"  批次 {batch_num}: 命中 LLM 缓存 ({len(results)} 条)")
+            return results
+
     # 选择使用哪个模型
     use_deepseek = gemini_exhausted or not GEMINI_API_KEY
-    
+
     if use_deepseek and not DEEPSEEK_API_KEY:
-        print(f"  批次 {batch_num}: 无可用的 API Key，跳过")
+        log.info(f"  批次 {batch_num}: 无可用的 API Key，跳过")
         return []
-    
+
     try:
-        if use_deepseek:
-            current_provider = "deepseek"
-            print(f"  批次 {batch_num}: 使用 DeepSeek...")
-            response_text = call_deepseek(prompt)
-        else:
-            current_provider = "gemini"
-            response_text = call_gemini(prompt)
-        
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(1)
+        async with semaphore:
+            # 限流在各 call_*_async 内部按服务商分别执行
+            if use_deepseek:
+                current_provider = "deepseek"
+                log.info(f"  批次 {batch_num}: 使用 DeepSeek...")
+                response_text = await call_deepseek_async(prompt)
+            elif DEEPSEEK_API_KEY:
+                # 双模型竞速：Gemini 先跑，DeepSeek 延迟起步兜底
+                current_provider, response_text = await _race_providers(prompt, items_text)
+            else:
+                current_provider = "gemini"
+                response_text = await call_gemini_async(prompt, items_text)
+
         # 解析响应
         results = parse_batch_response(response_text)
-        
+
         if results:
-            print(f"  批次 {batch_num}: 成功分析 {len(results)} 条 ({current_provider})")
+            log.info(f"  批次 {batch_num}: 成功分析 {len(results)} 条 ({current_provider})")
+            # 只缓存能成功解析的响应，避免把坏响应固化 24 小时
+            _cache_put(prompt, response_text)
             return results
         else:
-            print(f"  批次 {batch_num}: 解析失败，跳过")
+            log.info(f"  批次 {batch_num}: 解析失败，跳过")
             return []
-            
+
     except Exception as e:
         error_msg = str(e)
-        
+
         # Gemini 配额用完，切换到 DeepSeek
-        if not use_deepseek and ("429" in error_msg or "quota" in error_msg.lower()):
+        if not use_deepseek and _is_quota_error(error_msg):
             if retry_count < MAX_RETRIES:
                 wait_time = 10 * (retry_count + 1)
-                print(f"  批次 {batch_num}: Gemini 配额限制，等待 {wait_time} 秒后重试...")
-                time.sleep(wait_time)
-                return analyze_batch(items, batch_num, retry_count + 1)
-            
+                log.info(f"  批次 {batch_num}: Gemini 配额限制，等待 {wait_time} 秒后重试...")
+                await asyncio.sleep(wait_time)
+                return await analyze_batch_async(items, batch_num, semaphore, retry_count + 1)
+
             # 重试后仍然失败，切换到 DeepSeek
             if DEEPSEEK_API_KEY:
-                print(f"  批次 {batch_num}: Gemini 配额用完，切换到 DeepSeek...")
+                log.info(f"  批次 {batch_num}: Gemini 配额用完，切换到 DeepSeek...")
                 gemini_exhausted = True
-                return analyze_batch(items, batch_num, 0)  # 用 DeepSeek 重试
+                return await analyze_batch_async(items, batch_num, semaphore, 0)  # 用 DeepSeek 重试
             else:
-                print(f"  批次 {batch_num}: Gemini 配额用完，无 DeepSeek Key，跳过")
+                log.info(f"  批次 {batch_num}: Gemini 配额用完，无 DeepSeek Key，跳过")
                 return []
-        
+
         # 其他错误
-        print(f"  批次 {batch_num}: 错误 - {error_msg[:80]}，跳过")
+        log.info(f"  批次 {batch_num}: 错误 - {error_msg[:80]}，跳过")
         return []
 
 
+async def analyze_batches_async(batches: List[List[Dict]]) -> List[List[Dict]]:
+    """
+    并发分析多个批次，asyncio.gather 同时挂起所有请求
+    结果按批次顺序返回，失败的批次返回空列表
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+    tasks = [
+        analyze_batch_async(batch, batch_num, semaphore)
+        for batch_num, batch in enumerate(batches, start=1)
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return [r if isinstance(r, list) else [] for r in results]
+
+
+def analyze_batch(items: List[Dict], batch_num: int, retry_count: int = 0) -> List[Dict]:
+    """批量分析一组内容（同步包装，逻辑见 analyze_batch_async）"""
+    return asyncio.run(analyze_batch_async(items, batch_num, retry_count=retry_count))
+
+
 def analyze_posts_batch(items: list) -> list:
-    """批量分析所有内容"""
+    """批量分析所有内容（批次间并发，受 MAX_CONCURRENT_BATCHES 限制）"""
     if not items:
         return []
-    
+
+    # 同批文本去重，重复条目不再消耗 LLM 调用
+    items = drop_duplicate_content(items)
+
+    # 精确缓存命中的直接出结果，只有未见过的内容进 LLM
     relevant_items = []
-    total_batches = (len(items) + BATCH_SIZE - 1) // BATCH_SIZE
-    
-    print(f"\n开始批量分析 {len(items)} 条内容（{total_batches} 批）...")
-    print(f"  主模型: Gemini | 备用: DeepSeek")
-    print("-" * 50)
-    
-    for batch_idx in range(0, len(items), BATCH_SIZE):
-        batch_items = items[batch_idx:batch_idx + BATCH_SIZE]
-        batch_num = batch_idx // BATCH_SIZE + 1
-        
-        results = analyze_batch(batch_items, batch_num)
-        
+    misses = []
+    for item in items:
+        cached = analysis_cache.get(item)
+        if cached is None:
+            misses.append(item)
+            continue
+        if cached.get('is_relevant'):
+            # 条目在合并后不再另作他用，原地挂 analysis，省一次字典拷贝
+            item['analysis'] = {
+                'is_relevant': True,
+                'reason': cached.get('reason', ''),
+                'reply_draft': cached.get('reply_draft', '')
+            }
+            relevant_items.append(item)
+    if len(misses) < len(items):
+        log.info(f"  [缓存] 命中 {len(items) - len(misses)} 条历史分析结果")
+
+    batches = pack_batches(misses)
+
+    log.info(f"\n开始批量分析 {len(misses)} 条内容（{len(batches)} 批，并发 {MAX_CONCURRENT_BATCHES}）...")
+    log.info(f"  主模型: Gemini | 备用: DeepSeek")
+    log.info("-" * 50)
+
+    batch_results = asyncio.run(analyze_batches_async(batches))
+
+    for batch_items, results in zip(batches, batch_results):
         for result in results:
             if not isinstance(result, dict):
                 continue
-            
+
             idx = result.get('index')
             if idx is None or idx >= len(batch_items):
                 continue
-            
+
+            # 判定结果落缓存，下次重扫同内容直接复用
+            analysis_cache.put(batch_items[idx], result)
+
             if result.get('is_relevant', False):
-                item = batch_items[idx].copy()
+                # 原地挂 analysis，不复制整个条目字典
+                item = batch_items[idx]
                 item['analysis'] = {
                     'is_relevant': True,
                     'reason': result.get('reason', ''),
                     'reply_draft': result.get('reply_draft', '')
                 }
                 relevant_items.append(item)
-        
-        if batch_idx + BATCH_SIZE < len(items):
-            time.sleep(REQUEST_DELAY)
-    
-    print("-" * 50)
-    print(f"[分析完成] 相关: {len(relevant_items)}/{len(items)}")
-    
+
+    log.info("-" * 50)
+    log.info(f"[分析完成] 相关: {len(relevant_items)}/{len(items)}")
+
     return relevant_items
 
 
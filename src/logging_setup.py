@@ -0,0 +1,42 @@
+"""
+日志模块
+热路径上的诊断输出走 QueueHandler：调用线程只做一次入队，
+真正的 stdout 写入/刷新由后台监听线程完成，不阻塞分析和发送
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener = None
+
+
+def setup_logging(level: int = logging.INFO):
+    """初始化队列化日志（幂等，重复调用无副作用）"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter('%(message)s'))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+    # 退出前停止监听线程，确保队列里的日志全部落盘
+    atexit.register(_listener.stop)
+
+    # 生产环境日志失败不应抛异常打断主流程
+    logging.raiseExceptions = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取 logger，首次调用时自动完成初始化"""
+    setup_logging()
+    return logging.getLogger(name)
@@ -5,22 +5,27 @@ Reddit监测工具 - 主入口
 每30分钟运行一次，每次只处理40条（2批），分散API压力
 """
 
+import asyncio
 import os
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# 添加项目根目录到路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.reddit_fetcher import fetch_all_new_posts, load_processed_posts, save_processed_posts
-from src.gemini_analyzer import analyze_batch, BATCH_SIZE, REQUEST_DELAY
+from src.gemini_analyzer import analyze_batches_async, pack_batches, MAX_CONCURRENT_BATCHES
 from src.prefilter import pre_filter
 from src.queue_manager import (
     add_to_queue, get_items_to_process, remove_from_queue, 
     get_queue_stats, ITEMS_PER_RUN
 )
 from src.feishu_notifier import send_batch_to_feishu, send_summary_to_feishu
+from src.dedup import drop_duplicate_content
+from src import analysis_cache
+
+
+# 飞书发送在后台线程进行，主线程继续处理后续批次，汇总前统一收账
+_SEND_EXECUTOR = ThreadPoolExecutor(max_workers=4)
 
 
 def count_by_type(items: list) -> dict:
@@ -32,11 +37,6 @@ def count_by_type(items: list) -> dict:
     return counts
 
 
-def chunk_list(items: list, chunk_size: int) -> list:
-    """将列表分成固定大小的块"""
-    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
-
-
 def main():
     """主函数 - 队列处理模式"""
     print("=" * 60)
@@ -93,26 +93,72 @@ def main():
         return
     
     print(f"  本次处理 {len(items_to_process)} 条")
-    
-    # 分批处理
-    batches = chunk_list(items_to_process, BATCH_SIZE)
+
+    # 同批去重：跨版块转发的相同内容只分析一次，被丢弃的直接记为已处理
+    unique_items = drop_duplicate_content(items_to_process)
+    duplicate_ids = []
+    if len(unique_items) < len(items_to_process):
+        kept = set(map(id, unique_items))
+        duplicate_ids = [item['id'] for item in items_to_process
+                         if id(item) not in kept and item.get('id')]
+        items_to_process = unique_items
+
+    # 精确缓存：上次运行已分析过的内容直接复用结果，不再消耗 LLM 调用
+    cache_hits = []
+    misses = []
+    for item in items_to_process:
+        cached = analysis_cache.get(item)
+        if cached is None:
+            misses.append(item)
+        else:
+            cache_hits.append((item, cached))
+    if cache_hits:
+        print(f"  [缓存] 命中 {len(cache_hits)} 条历史分析结果")
+
+    # 分批处理（只有缓存未命中的才进 LLM；配置配额环境变量时按 token 装批）
+    batches = pack_batches(misses)
     total_batches = len(batches)
-    
-    print(f"  分 {total_batches} 批，每批 {BATCH_SIZE} 条，间隔 {REQUEST_DELAY} 秒")
+
+    print(f"  分 {total_batches} 批（并发 {MAX_CONCURRENT_BATCHES}，按配额自适应限流）")
     print("-" * 50)
-    
+
     # 统计
     total_relevant = 0
     total_sent = 0
-    processed_item_ids = []
+    processed_item_ids = list(duplicate_ids)
+    processed_ids.update(duplicate_ids)
     relevant_stats = {'post': 0, 'comment': 0, 'search': 0}
-    
-    for batch_idx, batch_items in enumerate(batches):
+
+    feishu_futures = []
+
+    # 先处理缓存命中的：结果现成，直接发通知并记为已处理
+    relevant_from_cache = []
+    for item, cached in cache_hits:
+        item_id = item.get('id', '')
+        if item_id:
+            processed_item_ids.append(item_id)
+            processed_ids.add(item_id)
+        if cached.get('is_relevant'):
+            # 条目在合并后不再另作他用，原地挂 analysis 即可，省一次字典拷贝
+            item['analysis'] = {
+                'is_relevant': True,
+                'reason': cached.get('reason', ''),
+                'reply_draft': cached.get('reply_draft', '')
+            }
+            relevant_from_cache.append(item)
+            content_type = item.get('type', 'post')
+            relevant_stats[content_type] = relevant_stats.get(content_type, 0) + 1
+    if relevant_from_cache:
+        feishu_futures.append(
+            _SEND_EXECUTOR.submit(send_batch_to_feishu, relevant_from_cache))
+        total_relevant += len(relevant_from_cache)
+
+    # 所有批次并发在途（asyncio.gather），总耗时 ≈ 最慢一批而非各批之和
+    batch_results = asyncio.run(analyze_batches_async(batches))
+
+    for batch_idx, (batch_items, results) in enumerate(zip(batches, batch_results)):
         batch_num = batch_idx + 1
-        
-        # 分析当前批次
-        results = analyze_batch(batch_items, batch_num)
-        
+
         # 处理分析结果
         relevant_in_batch = []
         for result in results:
@@ -122,9 +168,13 @@ def main():
             idx = result.get('index')
             if idx is None or idx >= len(batch_items):
                 continue
-            
+
+            # 结果落缓存（含不相关的判定），下次重扫同内容直接复用
+            analysis_cache.put(batch_items[idx], result)
+
             if result.get('is_relevant', False):
-                item = batch_items[idx].copy()
+                # 原地挂 analysis，不复制整个条目字典
+                item = batch_items[idx]
                 item['analysis'] = {
                     'is_relevant': True,
                     'reason': result.get('reason', ''),
@@ -136,12 +186,12 @@ def main():
                 content_type = item.get('type', 'post')
                 relevant_stats[content_type] = relevant_stats.get(content_type, 0) + 1
         
-        # 立即发送飞书通知
+        # 发送交给后台线程，主线程立刻处理下一批的结果
         if relevant_in_batch:
-            sent = send_batch_to_feishu(relevant_in_batch)
-            total_sent += sent
+            feishu_futures.append(
+                _SEND_EXECUTOR.submit(send_batch_to_feishu, relevant_in_batch))
             total_relevant += len(relevant_in_batch)
-            print(f"  批次 {batch_num}: 发现 {len(relevant_in_batch)} 条相关，已发送飞书")
+            print(f"  批次 {batch_num}: 发现 {len(relevant_in_batch)} 条相关，已提交飞书发送")
         else:
             print(f"  批次 {batch_num}: 无相关内容")
         
@@ -151,15 +201,14 @@ def main():
             if item_id:
                 processed_item_ids.append(item_id)
                 processed_ids.add(item_id)
-        
-        # 每批处理后立即保存（增量保存）
-        save_processed_posts(processed_ids)
-        
-        # 如果不是最后一批，等待
-        if batch_num < total_batches:
-            print(f"  等待 {REQUEST_DELAY} 秒...")
-            time.sleep(REQUEST_DELAY)
-    
+
+    # 分析已全部完成，只把本次新处理的ID增量写入存储
+    save_processed_posts(processed_item_ids)
+
+    # 收齐后台发送结果（保证汇总通知之前全部落地）
+    for future in feishu_futures:
+        total_sent += future.result()
+
     print("-" * 50)
     
     # 从队列中移除已处理的
@@ -3,25 +3,201 @@
 在调用 AI 前用关键词快速筛选可能相关的内容，减少 API 调用量
 """
 
-import os
-import sys
-from datetime import datetime, timedelta
+import functools
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
 from email.utils import parsedate_to_datetime
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import RELEVANCE_KEYWORDS, EXCLUDE_KEYWORDS
 
+# Aho-Corasick 自动机（C 扩展），一趟扫描同时匹配所有关键词
+# 未安装时退化为逐词 in 子串检查
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 正则回退路径优先用 google-re2（线性时间 DFA，无回溯）
+# 关键词都是转义后的字面量，语义与标准库 re 完全一致
+try:
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
 # 帖子最大年龄（天数），超过此时间的帖子将被过滤
 MAX_POST_AGE_DAYS = 7
 
+# 关键词统一小写，只在导入时转换一次
+_RELEVANCE_LC = tuple(kw.lower() for kw in RELEVANCE_KEYWORDS)
+_EXCLUDE_LC = tuple(kw.lower() for kw in EXCLUDE_KEYWORDS)
+
+
+def _build_automaton(keywords_lc: tuple):
+    """从小写关键词构建 Aho-Corasick 自动机，不可用时返回 None"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in keywords_lc:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+# 导入时构建一次，之后每条内容只需一趟线性扫描
+_RELEVANCE_AUTOMATON = _build_automaton(_RELEVANCE_LC)
+_EXCLUDE_AUTOMATON = _build_automaton(_EXCLUDE_LC)
+
+
+def _build_alternation(keywords_lc: tuple):
+    """
+    把所有关键词编译成一个交替正则，一次 C 级扫描替代 K 次 in 检查
+    保持与 'kw in text' 相同的子串匹配语义（不加词边界）
+    装了 google-re2 时走 DFA 引擎，扫描时间与关键词数量无关
+    """
+    return _re_engine.compile('|'.join(map(re.escape, keywords_lc)))
+
+
+# 自动机不可用时的快速回退路径（仍然只扫描文本一趟）
+_RELEVANCE_RE = _build_alternation(_RELEVANCE_LC)
+_EXCLUDE_RE = _build_alternation(_EXCLUDE_LC)
+
+# ============ 关键词命中位图 ============
+# 每个关键词占一个比特：相关词在低位、排除词在高位
+# 一次扫描得到一个 int，后续"是否排除/是否相关/命中几个词"都是位运算
+_ALL_KEYWORDS_LC = _RELEVANCE_LC + _EXCLUDE_LC
+MASK_RELEVANT = (1 << len(_RELEVANCE_LC)) - 1
+MASK_EXCLUDE = ((1 << len(_ALL_KEYWORDS_LC)) - 1) ^ MASK_RELEVANT
+
+
+def _build_indexed_automaton():
+    """带位号的合并自动机，一趟扫描收集两类关键词的全部命中"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for i, kw in enumerate(_ALL_KEYWORDS_LC):
+        automaton.add_word(kw, i)
+    automaton.make_automaton()
+    return automaton
 
-def is_post_too_old(item: dict) -> bool:
+
+_INDEXED_AUTOMATON = _build_indexed_automaton()
+
+
+def keyword_bits(text_lc: str) -> int:
+    """
+    计算小写文本的关键词命中位图
+    用 MASK_RELEVANT / MASK_EXCLUDE 与结果做 AND 即可得到分类判断
+    """
+    bits = 0
+    if _INDEXED_AUTOMATON is not None:
+        for _, i in _INDEXED_AUTOMATON.iter(text_lc):
+            bits |= 1 << i
+        return bits
+    # 回退：逐词 find（C 级子串查找），仍然只做一次 Python 循环
+    for i, kw in enumerate(_ALL_KEYWORDS_LC):
+        if kw in text_lc:
+            bits |= 1 << i
+    return bits
+
+
+def relevance_score_from_bits(bits: int) -> int:
+    """命中的相关关键词个数（去重后的种类数）"""
+    return (bits & MASK_RELEVANT).bit_count()
+
+
+# 合并扫描的启用门槛：条目太少时拼接与偏移定位的常数开销省不回来
+_BATCH_SCAN_MIN_ITEMS = 32
+
+
+def keyword_bits_batch(texts: list) -> list:
+    """
+    批量计算多段小写文本的关键词位图
+    自动机可用且条目够多时，把所有文本用 \\x1e 哨兵拼成一个大串只扫
+    一趟（N 次扫描调用摊销成 1 次），再用 bisect 把命中末端偏移映射
+    回条目序号。哨兵不出现在任何关键词里，匹配不会跨条目
+    """
+    if _INDEXED_AUTOMATON is None or len(texts) < _BATCH_SCAN_MIN_ITEMS:
+        return [keyword_bits(text) for text in texts]
+
+    # starts[k] = 第 k 段文本在大串中的起始偏移
+    starts = [0] * len(texts)
+    pos = 0
+    for k, text in enumerate(texts):
+        starts[k] = pos
+        pos += len(text) + 1
+    joined = '\x1e'.join(texts)
+
+    bits_list = [0] * len(texts)
+    for end_idx, i in _INDEXED_AUTOMATON.iter(joined):
+        bits_list[bisect_right(starts, end_idx) - 1] |= 1 << i
+    return bits_list
+
+
+# 各类空白字符统一映射为空格（C 级转换，比 re.sub(r'\s+',' ') 便宜）
+# 让跨行文本也能命中带空格的关键词（如 "looking for"）
+_WS_TRANS = str.maketrans('\t\n\r\x0b\x0c', '     ')
+
+
+def get_item_text(item: dict) -> str:
+    """
+    获取内容项归一化后的文本（标题+正文，小写、空白统一为空格）
+    结果缓存在 item['_lc'] 上，避免多个检查点重复归一化
+    """
+    text = item.get('_lc')
+    if text is None:
+        text = (item.get('title', '') + ' ' + item.get('content', '')).lower().translate(_WS_TRANS)
+        item['_lc'] = text
+    return text
+
+
+def _has_match(automaton, pattern, text_lc: str) -> bool:
+    """检查小写文本是否命中任意关键词，优先走自动机（短路）"""
+    if automaton is not None:
+        return next(automaton.iter(text_lc), None) is not None
+    return pattern.search(text_lc) is not None
+
+
+def has_relevance(text_lc: str) -> bool:
+    """检查小写文本是否包含相关关键词"""
+    return _has_match(_RELEVANCE_AUTOMATON, _RELEVANCE_RE, text_lc)
+
+
+def has_exclude(text_lc: str) -> bool:
+    """检查小写文本是否包含排除关键词"""
+    return _has_match(_EXCLUDE_AUTOMATON, _EXCLUDE_RE, text_lc)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_published(published: str):
+    """
+    解析 RSS 的 published 字段（RFC 2822 格式，
+    例如 "Mon, 13 Jan 2025 10:30:00 +0000"），失败返回 None
+    同一时间串在评论流里大量重复，lru_cache 省掉重复的正则+时区解析
+    """
+    try:
+        pub_date = parsedate_to_datetime(published)
+    except Exception:
+        return None
+    # 个别 feed 不带时区，按 UTC 处理
+    if pub_date.tzinfo is None:
+        pub_date = pub_date.replace(tzinfo=timezone.utc)
+    return pub_date
+
+
+def _age_cutoff_utc() -> datetime:
+    """最大年龄对应的 UTC 截止时间（一次运行内算一次即可）"""
+    return datetime.now(timezone.utc) - timedelta(days=MAX_POST_AGE_DAYS)
+
+
+def is_post_too_old(item: dict, cutoff_utc: datetime = None) -> bool:
     """
     检查帖子是否超过最大年龄限制
-    
+
     Args:
         item: 内容项，包含 published 字段
-        
+        cutoff_utc: 预先算好的截止时间；不传时现算（单条调用路径）
+
     Returns:
         True 如果帖子太旧，应该被过滤
     """
@@ -29,78 +205,81 @@ def is_post_too_old(item: dict) -> bool:
     if not published:
         # 没有发布时间的内容保留（让AI判断）
         return False
-    
-    try:
-        # RSS 的 published 字段通常是 RFC 2822 格式
-        # 例如: "Mon, 13 Jan 2025 10:30:00 +0000"
-        pub_date = parsedate_to_datetime(published)
-        cutoff_date = datetime.now(pub_date.tzinfo) - timedelta(days=MAX_POST_AGE_DAYS)
-        return pub_date < cutoff_date
-    except Exception:
+
+    pub_date = _parse_published(published)
+    if pub_date is None:
         # 解析失败的保留
         return False
 
+    if cutoff_utc is None:
+        cutoff_utc = _age_cutoff_utc()
+    return pub_date < cutoff_utc
+
 
 def pre_filter(items: list) -> list:
     """
     预过滤内容，减少 AI 调用量
-    
+
     规则：
     1. 排除超过 MAX_POST_AGE_DAYS 天的旧帖子
     2. 排除包含 EXCLUDE_KEYWORDS 的内容（明显不相关）
     3. 优先保留包含 RELEVANCE_KEYWORDS 的内容
     4. 对于既不包含排除词也不包含相关词的，也保留（让AI判断）
-    
+
     Args:
         items: 原始内容列表
-        
+
     Returns:
         过滤后的内容列表
     """
     if not items:
         return []
-    
+
     filtered = []
     excluded_by_keyword = 0
-    excluded_by_age = 0
-    
-    for item in items:
-        # 检查是否太旧
-        if is_post_too_old(item):
-            excluded_by_age += 1
-            continue
-        
-        # 合并标题和内容进行检查
-        text = (item.get('title', '') + ' ' + item.get('content', '')).lower()
-        
-        # 检查是否包含排除关键词
-        should_exclude = False
-        for kw in EXCLUDE_KEYWORDS:
-            if kw.lower() in text:
-                should_exclude = True
-                break
-        
-        if should_exclude:
+
+    # 截止时间整批只算一次，不在循环里反复取 now
+    cutoff_utc = _age_cutoff_utc()
+
+    # 先按年龄过滤，存活条目再进关键词扫描
+    alive = [item for item in items if not is_post_too_old(item, cutoff_utc)]
+    excluded_by_age = len(items) - len(alive)
+
+    # 整批拼接一次扫描出所有位图（小写文本缓存在 item 上供后续复用）
+    all_bits = keyword_bits_batch([get_item_text(item) for item in alive])
+
+    for item, bits in zip(alive, all_bits):
+        # 位图缓存在 item 上（下游直接复用）
+        item['_bits'] = bits
+
+        # 排除判断 = 一次位与
+        if bits & MASK_EXCLUDE:
             excluded_by_keyword += 1
             continue
-        
+
+        # 打分与过滤融合在同一趟：位图现成，popcount 即得分，
+        # 入队时不再重扫文本
+        item['relevance_score'] = relevance_score_from_bits(bits)
+
         # 通过排除检查的内容保留
         filtered.append(item)
-    
+
     # 打印过滤统计
     if excluded_by_age > 0:
         print(f"  [预过滤] 排除 {excluded_by_age} 条超过 {MAX_POST_AGE_DAYS} 天的旧帖子")
     if excluded_by_keyword > 0:
         print(f"  [预过滤] 排除 {excluded_by_keyword} 条明显不相关内容")
     print(f"  [预过滤] 保留 {len(filtered)} 条待分析")
-    
+
     return filtered
 
 
 def has_relevance_keywords(item: dict) -> bool:
-    """检查内容是否包含相关关键词"""
-    text = (item.get('title', '') + ' ' + item.get('content', '')).lower()
-    return any(kw.lower() in text for kw in RELEVANCE_KEYWORDS)
+    """检查内容是否包含相关关键词（优先复用缓存的位图）"""
+    bits = item.get('_bits')
+    if bits is not None:
+        return bool(bits & MASK_RELEVANT)
+    return has_relevance(get_item_text(item))
 
 
 def prioritize_by_relevance(items: list) -> list:
@@ -110,11 +289,11 @@ def prioritize_by_relevance(items: list) -> list:
     """
     with_keywords = []
     without_keywords = []
-    
+
     for item in items:
         if has_relevance_keywords(item):
             with_keywords.append(item)
         else:
             without_keywords.append(item)
-    
+
     return with_keywords + without_keywords
@@ -1,152 +1,183 @@
 """
 队列管理模块
-管理待处理内容的优先级队列，使用 JSON 文件存储
+管理待处理内容的优先级队列，使用 SQLite 存储（WAL 模式）
+入队/移除是索引级单条操作，取件靠 relevance_score 索引排序，
+不再像旧版 JSON 那样每次改动都整文件重读重写重排
 """
 
 import json
 import os
+import sqlite3
 from datetime import datetime
 from typing import List, Dict
 
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import RELEVANCE_KEYWORDS
+from src.prefilter import get_item_text, keyword_bits, relevance_score_from_bits
 
-# 队列文件路径
-QUEUE_FILE = "data/pending_queue.json"
+# 队列数据库路径
+QUEUE_DB = "data/queue.sqlite"
+
+# 旧版 JSON 队列文件，首次打开数据库时自动迁移
+LEGACY_QUEUE_FILE = "data/pending_queue.json"
 
 # 每次处理的数量
 ITEMS_PER_RUN = 40
 
+# 队列表的列顺序（与 INSERT/SELECT 保持一致）
+_FIELDS = ('id', 'type', 'subreddit', 'title', 'content', 'link', 'author',
+           'search_keyword', 'relevance_score', 'added_at')
+
+# 模块级连接：进程内复用
+_conn = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        db_dir = os.path.dirname(QUEUE_DB)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        _conn = sqlite3.connect(QUEUE_DB)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue("
+            "id TEXT PRIMARY KEY, type TEXT, subreddit TEXT, title TEXT,"
+            " content TEXT, link TEXT, author TEXT, search_keyword TEXT,"
+            " relevance_score INT, added_at TEXT)"
+        )
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_score ON queue(relevance_score DESC)"
+        )
+        _conn.commit()
+        _migrate_legacy_queue(_conn)
+    return _conn
+
+
+def _migrate_legacy_queue(conn: sqlite3.Connection):
+    """一次性导入旧版 JSON 队列，完成后重命名旧文件防止重复导入"""
+    if not os.path.exists(LEGACY_QUEUE_FILE):
+        return
+    try:
+        with open(LEGACY_QUEUE_FILE, 'r', encoding='utf-8') as f:
+            legacy = json.load(f).get('queue', [])
+        if legacy:
+            conn.executemany(
+                "INSERT OR IGNORE INTO queue VALUES(?,?,?,?,?,?,?,?,?,?)",
+                [tuple(item.get(k, 0 if k == 'relevance_score' else '')
+                       for k in _FIELDS)
+                 for item in legacy if item.get('id')]
+            )
+            conn.commit()
+            print(f"  [队列] 已迁移 {len(legacy)} 条旧版 JSON 队列")
+        os.replace(LEGACY_QUEUE_FILE, LEGACY_QUEUE_FILE + '.migrated')
+    except Exception as e:
+        print(f"[警告] 迁移旧版队列失败: {e}")
+
 
 def calculate_relevance_score(item: dict) -> int:
     """
-    计算内容的相关性分数
+    计算内容的相关性分数（命中的相关关键词种类数）
     分数越高，越优先处理
+    复用 prefilter 的自动机位图：一趟扫描替代逐词 in 检查，
+    预过滤阶段算过的位图直接从 item['_bits'] 拿
     """
-    text = (item.get('title', '') + ' ' + item.get('content', '')).lower()
-    score = sum(1 for kw in RELEVANCE_KEYWORDS if kw.lower() in text)
-    return score
-
-
-def load_queue() -> List[Dict]:
-    """加载待处理队列"""
-    try:
-        if os.path.exists(QUEUE_FILE):
-            with open(QUEUE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('queue', [])
-    except Exception as e:
-        print(f"[警告] 加载队列失败: {e}")
-    return []
-
-
-def save_queue(queue: List[Dict]):
-    """保存队列到文件"""
-    try:
-        os.makedirs(os.path.dirname(QUEUE_FILE), exist_ok=True)
-        data = {
-            'queue': queue,
-            'last_updated': datetime.now().isoformat()
-        }
-        with open(QUEUE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[错误] 保存队列失败: {e}")
+    bits = item.get('_bits')
+    if bits is None:
+        bits = keyword_bits(get_item_text(item))
+    return relevance_score_from_bits(bits)
 
 
 def add_to_queue(items: List[Dict], processed_ids: set) -> int:
     """
     将新内容添加到队列
-    
+
     Args:
         items: 预过滤后的新内容列表
         processed_ids: 已处理的ID集合（避免重复）
-    
+
     Returns:
         新增的数量
     """
-    queue = load_queue()
-    existing_ids = {item.get('id') for item in queue}
-    
-    added_count = 0
+    conn = _get_conn()
+
+    rows = []
+    now = datetime.now().isoformat()
     for item in items:
         item_id = item.get('id', item.get('link', ''))
-        
-        # 跳过已在队列或已处理的
-        if item_id in existing_ids or item_id in processed_ids:
+
+        # 已处理的跳过；已在队列的由主键 INSERT OR IGNORE 去重
+        if item_id in processed_ids:
             continue
-        
-        # 计算优先级分数
-        score = calculate_relevance_score(item)
-        
-        # 添加到队列
-        queue_item = {
-            'id': item_id,
-            'type': item.get('type', 'post'),
-            'subreddit': item.get('subreddit', ''),
-            'title': item.get('title', ''),
-            'content': item.get('content', ''),
-            'link': item.get('link', ''),
-            'author': item.get('author', ''),
-            'search_keyword': item.get('search_keyword', ''),
-            'relevance_score': score,
-            'added_at': datetime.now().isoformat()
-        }
-        queue.append(queue_item)
-        added_count += 1
-    
-    # 按优先级排序（分数高的在前）
-    queue.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
-    
-    save_queue(queue)
-    return added_count
+
+        # 预过滤阶段已融合打分（item['relevance_score']），这里直接取用
+        score = item.get('relevance_score')
+        if score is None:
+            score = calculate_relevance_score(item)
+
+        rows.append((
+            item_id,
+            item.get('type', 'post'),
+            item.get('subreddit', ''),
+            item.get('title', ''),
+            item.get('content', ''),
+            item.get('link', ''),
+            item.get('author', ''),
+            item.get('search_keyword', ''),
+            score,
+            now,
+        ))
+
+    if not rows:
+        return 0
+
+    # 单事务批量插入；不再需要全队列排序，取件时走分数索引
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO queue VALUES(?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.commit()
+    return conn.total_changes - before
 
 
 def get_items_to_process(count: int = ITEMS_PER_RUN) -> List[Dict]:
     """
     获取待处理的内容（优先级最高的）
-    
+
     Args:
         count: 获取的数量
-    
+
     Returns:
         待处理的内容列表
     """
-    queue = load_queue()
-    
-    # 取前 count 条（已按优先级排序）
-    items = queue[:count]
-    
-    return items
+    rows = _get_conn().execute(
+        "SELECT * FROM queue ORDER BY relevance_score DESC LIMIT ?", (count,)
+    ).fetchall()
+    return [dict(zip(_FIELDS, row)) for row in rows]
 
 
 def remove_from_queue(item_ids: List[str]):
     """
     从队列中移除已处理的内容
-    
+
     Args:
         item_ids: 要移除的ID列表
     """
-    queue = load_queue()
-    ids_to_remove = set(item_ids)
-    
-    # 过滤掉已处理的
-    new_queue = [item for item in queue if item.get('id') not in ids_to_remove]
-    
-    save_queue(new_queue)
-    
-    removed_count = len(queue) - len(new_queue)
+    if not item_ids:
+        return
+
+    conn = _get_conn()
+    before = conn.total_changes
+    conn.executemany("DELETE FROM queue WHERE id = ?",
+                     [(item_id,) for item_id in item_ids])
+    conn.commit()
+
+    removed_count = conn.total_changes - before
     if removed_count > 0:
         print(f"  [队列] 移除 {removed_count} 条已处理内容")
 
 
 def get_queue_stats() -> Dict:
-    """获取队列统计信息"""
-    queue = load_queue()
-    
+    """获取队列统计信息（类型 × 分数桶一次扫描聚合完）"""
     stats = {
-        'total': len(queue),
+        'total': 0,
         'by_type': {},
         'by_score': {
             'high': 0,    # score >= 3
@@ -154,19 +185,17 @@ def get_queue_stats() -> Dict:
             'low': 0      # score 0
         }
     }
-    
-    for item in queue:
-        # 按类型统计
-        item_type = item.get('type', 'post')
-        stats['by_type'][item_type] = stats['by_type'].get(item_type, 0) + 1
-        
-        # 按分数统计
-        score = item.get('relevance_score', 0)
-        if score >= 3:
-            stats['by_score']['high'] += 1
-        elif score >= 1:
-            stats['by_score']['medium'] += 1
-        else:
-            stats['by_score']['low'] += 1
-    
+
+    # 单条 GROUP BY 查询只扫一遍表，Python 侧把分组计数拆到两个维度
+    for item_type, bucket, n in _get_conn().execute(
+            "SELECT type,"
+            " CASE WHEN relevance_score >= 3 THEN 'high'"
+            " WHEN relevance_score >= 1 THEN 'medium'"
+            " ELSE 'low' END,"
+            " COUNT(*) FROM queue GROUP BY 1, 2"):
+        item_type = item_type or 'post'
+        stats['by_type'][item_type] = stats['by_type'].get(item_type, 0) + n
+        stats['by_score'][bucket] += n
+        stats['total'] += n
+
     return stats
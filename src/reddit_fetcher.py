@@ -7,19 +7,18 @@ import feedparser
 import json
 import os
 import re
+import sqlite3
 import time
 import urllib.parse
-from datetime import datetime
 from typing import List, Dict, Optional
 from bs4 import BeautifulSoup
 
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import (
-    SUBREDDITS, POSTS_PER_SUBREDDIT, PROCESSED_POSTS_FILE, MAX_PROCESSED_POSTS,
-    MONITOR_COMMENTS, COMMENTS_PER_SUBREDDIT,
+    SUBREDDITS, POSTS_PER_SUBREDDIT, PROCESSED_DB, PROCESSED_POSTS_FILE,
+    MAX_PROCESSED_POSTS, MONITOR_COMMENTS, COMMENTS_PER_SUBREDDIT,
     ENABLE_KEYWORD_SEARCH, SEARCH_KEYWORDS, SEARCH_RESULTS_PER_KEYWORD
 )
+from src.dedup import ProcessedIndex
 
 # Reddit RSS 请求间隔（秒），避免被限流
 REQUEST_DELAY = 0.3
@@ -178,36 +177,71 @@ def fetch_keyword_search(keyword: str, limit: int = 10) -> List[Dict]:
     return results
 
 
+# 已处理ID库的模块级连接（WAL 模式，进程内复用）
+_processed_conn = None
+
+
+def _get_processed_conn() -> sqlite3.Connection:
+    global _processed_conn
+    if _processed_conn is None:
+        db_dir = os.path.dirname(PROCESSED_DB)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        _processed_conn = sqlite3.connect(PROCESSED_DB)
+        _processed_conn.execute("PRAGMA journal_mode=WAL")
+        _processed_conn.execute("PRAGMA synchronous=NORMAL")
+        _processed_conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed(id TEXT PRIMARY KEY)"
+        )
+        _processed_conn.commit()
+        _migrate_legacy_processed(_processed_conn)
+    return _processed_conn
+
+
+def _migrate_legacy_processed(conn: sqlite3.Connection):
+    """一次性导入旧版 JSON 记录，完成后重命名旧文件防止重复导入"""
+    if not os.path.exists(PROCESSED_POSTS_FILE):
+        return
+    try:
+        with open(PROCESSED_POSTS_FILE, 'r', encoding='utf-8') as f:
+            legacy = json.load(f).get('processed_ids', [])
+        if legacy:
+            conn.executemany("INSERT OR IGNORE INTO processed VALUES(?)",
+                             [(item_id,) for item_id in legacy])
+            conn.commit()
+            print(f"[存储] 已迁移 {len(legacy)} 条旧版已处理记录")
+        os.replace(PROCESSED_POSTS_FILE, PROCESSED_POSTS_FILE + '.migrated')
+    except Exception as e:
+        print(f"[警告] 迁移旧版已处理记录失败: {e}")
+
+
 def load_processed_posts() -> set:
     """加载已处理的帖子ID集合"""
     try:
-        if os.path.exists(PROCESSED_POSTS_FILE):
-            with open(PROCESSED_POSTS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return set(data.get('processed_ids', []))
+        return {row[0] for row in
+                _get_processed_conn().execute("SELECT id FROM processed")}
     except Exception as e:
         print(f"[警告] 加载已处理记录失败: {e}")
     return set()
 
 
-def save_processed_posts(processed_ids: set):
-    """保存已处理的帖子ID"""
+def save_processed_posts(new_ids):
+    """
+    追加本次新处理的ID（只写增量，不再整文件重写全量集合）
+    超出 MAX_PROCESSED_POSTS 时按插入顺序淘汰最旧的记录
+    """
     try:
-        os.makedirs(os.path.dirname(PROCESSED_POSTS_FILE), exist_ok=True)
-        
-        ids_list = list(processed_ids)
-        if len(ids_list) > MAX_PROCESSED_POSTS:
-            ids_list = ids_list[-MAX_PROCESSED_POSTS:]
-        
-        data = {
-            'processed_ids': ids_list,
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open(PROCESSED_POSTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        print(f"[存储] 保存了 {len(ids_list)} 条已处理记录")
+        conn = _get_processed_conn()
+        conn.executemany("INSERT OR IGNORE INTO processed VALUES(?)",
+                         [(item_id,) for item_id in new_ids if item_id])
+        # rowid 单调递增，按其淘汰最旧的，防止库无限增长
+        conn.execute(
+            "DELETE FROM processed WHERE rowid NOT IN"
+            " (SELECT rowid FROM processed ORDER BY rowid DESC LIMIT ?)",
+            (MAX_PROCESSED_POSTS,)
+        )
+        conn.commit()
+        print(f"[存储] 新增 {len(new_ids)} 条已处理记录")
     except Exception as e:
         print(f"[错误] 保存已处理记录失败: {e}")
 
@@ -219,22 +253,23 @@ def fetch_all_new_posts() -> List[Dict]:
     Returns:
         新内容列表（已去重）
     """
-    processed_ids = load_processed_posts()
+    # Bloom 在前、集合兜底的判重索引
+    index = ProcessedIndex(load_processed_posts())
     all_new_items = []
-    
+
     stats = {'posts': 0, 'comments': 0, 'search': 0}
-    
+
     # 1. 获取Subreddit帖子
     print("\n📝 获取帖子...")
     print("-" * 40)
     for subreddit in SUBREDDITS:
         posts = fetch_subreddit_posts(subreddit, POSTS_PER_SUBREDDIT)
         for post in posts:
-            if post['id'] not in processed_ids:
+            if not index.seen(post['id']):
                 all_new_items.append(post)
-                processed_ids.add(post['id'])
+                index.mark(post['id'])
                 stats['posts'] += 1
-    
+
     # 2. 获取Subreddit评论
     if MONITOR_COMMENTS:
         print("\n💬 获取评论...")
@@ -242,11 +277,11 @@ def fetch_all_new_posts() -> List[Dict]:
         for subreddit in SUBREDDITS:
             comments = fetch_subreddit_comments(subreddit, COMMENTS_PER_SUBREDDIT)
             for comment in comments:
-                if comment['id'] not in processed_ids:
+                if not index.seen(comment['id']):
                     all_new_items.append(comment)
-                    processed_ids.add(comment['id'])
+                    index.mark(comment['id'])
                     stats['comments'] += 1
-    
+
     # 3. 关键词搜索
     if ENABLE_KEYWORD_SEARCH:
         print("\n🔍 关键词搜索...")
@@ -254,13 +289,14 @@ def fetch_all_new_posts() -> List[Dict]:
         for keyword in SEARCH_KEYWORDS:
             results = fetch_keyword_search(keyword, SEARCH_RESULTS_PER_KEYWORD)
             for result in results:
-                if result['id'] not in processed_ids:
+                if not index.seen(result['id']):
                     all_new_items.append(result)
-                    processed_ids.add(result['id'])
+                    index.mark(result['id'])
                     stats['search'] += 1
-    
-    # 保存更新后的已处理记录
-    save_processed_posts(processed_ids)
+
+    # 保存本次新增的已处理记录（增量插入 + bloom 旁路文件）
+    save_processed_posts([item['id'] for item in all_new_items])
+    index.save_bloom()
     
     # 打印统计
     print(f"\n{'=' * 40}")